@@ -0,0 +1,73 @@
+"""
+Compares the CPU cost and bandwidth savings of compressing large packets with a `CompressingSerializer`.
+
+Run from the repository root with `python -m benchmarks.bench_compression`. Zstandard rows are skipped if the optional
+`zstandard` package is not installed.
+"""
+import random
+import timeit
+from typing import Callable, Optional
+from netbound.packet import BasePacket, compressible
+from netbound.packet.compression import BaseCompressor, ZlibCompressor, ZstdCompressor
+from netbound.packet.serializer import MessagePackSerializer, RecordingSerializer
+
+@compressible
+class MapChunkPacket(BasePacket):
+    x: int
+    y: int
+    tiles: list[int]
+    entities: list[dict[str, int | str]]
+
+def make_chunk(rng: random.Random) -> MapChunkPacket:
+    # Mostly grass with patches of water and trees, like a typical overworld chunk
+    tiles: list[int] = []
+    tile: int = 0
+    for _ in range(32 * 32):
+        if rng.random() < 0.1:
+            tile = rng.choice([0, 0, 0, 1, 2, 3])
+        tiles.append(tile)
+    entities: list[dict[str, int | str]] = [
+        {"kind": rng.choice(["tree", "rock", "chest", "npc"]), "x": rng.randrange(32), "y": rng.randrange(32), "hp": 100}
+        for _ in range(rng.randrange(5, 20))
+    ]
+    return MapChunkPacket(from_pid=bytes(16), x=rng.randrange(-100, 100), y=rng.randrange(-100, 100), tiles=tiles, entities=entities)
+
+def bench(name: str, compressor: Optional[BaseCompressor], data: list[bytes]) -> None:
+    compress: Callable[[bytes], bytes] = compressor.compress if compressor else lambda d: d
+    compressed: list[bytes] = [compress(d) for d in data]
+    compress_time: float = timeit.timeit(lambda: [compress(d) for d in data], number=5) / 5 / len(data)
+    if compressor:
+        decompress_time: float = timeit.timeit(lambda: [compressor.decompress(c, 2 ** 20) for c in compressed], number=5) / 5 / len(data)
+    else:
+        decompress_time = 0
+    raw_size: float = sum(map(len, data)) / len(data)
+    size: float = sum(map(len, compressed)) / len(compressed)
+    print(f"{name:<24}{size:>10.0f}{raw_size / size:>8.2f}x{compress_time * 1e6:>14.1f}{decompress_time * 1e6:>16.1f}")
+
+def main() -> None:
+    rng: random.Random = random.Random(1234)
+    recorder: RecordingSerializer = RecordingSerializer(MessagePackSerializer())
+    for _ in range(1000):
+        recorder.serialize(make_chunk(rng))
+    training, data = recorder.samples[:800], recorder.samples[800:]
+
+    print(f"{'compressor':<24}{'bytes':>10}{'ratio':>9}{'compress (us)':>14}{'decompress (us)':>16}")
+    bench("none", None, data)
+    for level in (1, 6, 9):
+        bench(f"zlib level {level}", ZlibCompressor(level), data)
+    zlib_dictionary: bytes = ZlibCompressor.train_dictionary(training)
+    for level in (1, 6):
+        bench(f"zlib level {level} + dict", ZlibCompressor(level, zlib_dictionary), data)
+
+    try:
+        zstd_dictionary: bytes = ZstdCompressor.train_dictionary(training)
+    except ImportError:
+        print("zstandard is not installed, skipping zstd")
+        return
+    for level in (1, 3, 19):
+        bench(f"zstd level {level}", ZstdCompressor(level), data)
+    for level in (1, 3):
+        bench(f"zstd level {level} + dict", ZstdCompressor(level, zstd_dictionary), data)
+
+if __name__ == "__main__":
+    main()
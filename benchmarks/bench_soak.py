@@ -0,0 +1,70 @@
+"""
+Soak tests the server with many in-memory clients, measuring netbound's own CPU cost per tick without any socket, kernel
+or TLS overhead. Every tick, each client sends a packet, its state replies, and the client reads the previous tick's reply.
+
+Run from the repository root with `python -m benchmarks.bench_soak --players 50000`.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import types
+from sqlalchemy.ext.asyncio import create_async_engine
+from netbound.app import ServerApp
+from netbound.app.transport import InMemoryClient
+from netbound.packet import BasePacket
+from netbound.packet.serializer import MessagePackSerializer
+from netbound.state import BaseState
+
+class MovePacket(BasePacket):
+    x: float
+    y: float
+
+class AckPacket(BasePacket):
+    x: float
+    y: float
+
+class PlayState(BaseState):
+    async def handle_move(self, p: MovePacket) -> None:
+        await self._send_to_client(AckPacket(from_pid=self._pid, x=p.x, y=p.y))
+
+async def main(players: int, ticks: int) -> None:
+    server: ServerApp = ServerApp("127.0.0.1", 0, create_async_engine("sqlite+aiosqlite://"))
+    packets: types.ModuleType = types.ModuleType("packets")
+    packets.MovePacket, packets.AckPacket = MovePacket, AckPacket
+    server.register_packets(packets, precompile=True)
+
+    start: float = time.perf_counter()
+    clients: list[InMemoryClient] = [await server.connect_in_memory(PlayState) for _ in range(players)]
+    await asyncio.sleep(0)
+    print(f"Connected {players} clients in {time.perf_counter() - start:.2f}s")
+
+    # Serialized up front, so that only the server's side is timed
+    serializer: MessagePackSerializer = MessagePackSerializer()
+    messages: list[bytes] = [serializer.serialize_as_client(MovePacket(from_pid=c.pid, x=1.0, y=2.0)) for c in clients]
+    tick_times: list[float] = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        for client, message in zip(clients, messages):
+            await client.send(message)
+        await asyncio.sleep(0)  # Let each protocol deserialize its packet
+        await server._tick()
+        # Replies are sent to clients at the start of the tick after the one that produced them
+        for client in clients:
+            if client.pending():
+                await client.recv()
+        tick_times.append(time.perf_counter() - start)
+
+    median: float = statistics.median(tick_times)
+    print(f"Median tick: {median * 1000:.1f} ms ({median / players * 1e6:.2f} us per player)")
+
+    for client in clients:
+        await client.close()
+    await asyncio.sleep(0.1)
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--ticks", type=int, default=20)
+    args: argparse.Namespace = parser.parse_args()
+    asyncio.run(main(args.players, args.ticks))
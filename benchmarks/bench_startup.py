@@ -0,0 +1,82 @@
+"""
+Measures how long a fresh process takes to import netbound, and how long it takes from launching a server process to
+the server accepting its first websocket connection.
+
+Run from the repository root with `python -m benchmarks.bench_startup`.
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import websockets as ws
+
+RUNS: int = 10
+PACKET_CLASSES: int = 50
+
+SERVER_SCRIPT: str = f"""
+import asyncio, sys, types
+from sqlalchemy.ext.asyncio import create_async_engine
+from netbound.app import ServerApp
+from netbound.packet import BasePacket
+from netbound.state import BaseState
+
+packets = types.ModuleType("packets")
+for i in range({PACKET_CLASSES}):
+    name = f"Move{{i}}Packet"
+    setattr(packets, name, type(name, (BasePacket,), {{"__annotations__": {{"x": float, "y": float, "tags": list[str]}}}}))
+
+class EntryState(BaseState):
+    pass
+
+async def main():
+    server = ServerApp("127.0.0.1", int(sys.argv[1]), create_async_engine("sqlite+aiosqlite://"))
+    server.register_packets(packets, precompile=sys.argv[2] == "precompile")
+    await asyncio.gather(server.start(EntryState), server.run(20))
+
+asyncio.run(main())
+"""
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_process(code: str) -> float:
+    start: float = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True)
+    return time.perf_counter() - start
+
+async def time_to_first_accept(mode: str) -> float:
+    port: int = free_port()
+    start: float = time.perf_counter()
+    server: subprocess.Popen = subprocess.Popen(
+        [sys.executable, "-c", SERVER_SCRIPT, str(port), mode],
+        env={**os.environ, "PYTHONPATH": os.getcwd()}
+    )
+    try:
+        while True:
+            try:
+                async with ws.connect(f"ws://127.0.0.1:{port}"):
+                    return time.perf_counter() - start
+            except OSError:
+                await asyncio.sleep(0.002)
+    finally:
+        server.kill()
+        server.wait()
+
+def report(name: str, samples: list[float]) -> None:
+    print(f"{name:<40}{statistics.median(samples) * 1000:>10.1f}{min(samples) * 1000:>10.1f}")
+
+def main() -> None:
+    print(f"{'measurement':<40}{'median ms':>10}{'min ms':>10}")
+    report("python -c pass", [time_process("pass") for _ in range(RUNS)])
+    for module in ("netbound", "netbound.packet", "netbound.state", "netbound.app", "netbound.app.server"):
+        report(f"import {module}", [time_process(f"import {module}") for _ in range(RUNS)])
+    for mode in ("lazy", "precompile"):
+        report(f"first accept ({mode}, {PACKET_CLASSES} packets)", [asyncio.run(time_to_first_accept(mode)) for _ in range(RUNS)])
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,18 @@
-from netbound.app.server import ServerApp
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from netbound.app.server import ServerApp
+    from netbound.app.options import WebSocketOptions
+
+# Star imports look these up through __getattr__ too
+__all__ = ["ServerApp", "WebSocketOptions"]
+
+def __getattr__(name: str):
+    # The server pulls in websockets and SQLAlchemy, so only import it when it's asked for
+    if name == "ServerApp":
+        from netbound.app.server import ServerApp
+        return ServerApp
+    if name == "WebSocketOptions":
+        from netbound.app.options import WebSocketOptions
+        return WebSocketOptions
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
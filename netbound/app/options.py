@@ -0,0 +1,61 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Optional
+
+@dataclass
+class WebSocketOptions:
+    """
+    Tuning options for the websocket server started by `ServerApp.start`. The defaults match the defaults of the
+    `websockets` library.
+
+    Permessage-deflate trades CPU time on both ends for bandwidth. Lowering `compression_level` saves CPU, and lowering
+    `max_window_bits` or `memory_level` saves memory on each connection at the cost of a worse compression ratio. Set
+    `compression_level` to `None` to turn permessage-deflate off entirely, e.g. if large packets are already compressed
+    by a `netbound.packet.serializer.CompressingSerializer`.
+    """
+    compression_level: Optional[int] = 6
+    """The zlib compression level (0-9) used by permessage-deflate, or `None` to disable it."""
+
+    max_window_bits: int = 12
+    """The base-two logarithm of the deflate window size (9-15) used in both directions."""
+
+    memory_level: int = 5
+    """How much memory zlib may use for its internal compression state (1-9)."""
+
+    no_context_takeover: bool = False
+    """If `True`, the server resets its deflate context after every message. This saves memory on each connection at
+    the cost of a worse compression ratio for streams of similar packets."""
+
+    max_size: Optional[int] = 2 ** 20
+    """The largest incoming message in bytes, or `None` for no limit. Larger messages close the connection."""
+
+    max_queue: Optional[int] = 32
+    """The most incoming messages buffered for each connection before the server stops reading from it."""
+
+    read_limit: int = 2 ** 16
+    """The high-water mark of the buffer for incoming data on each connection, in bytes."""
+
+    write_limit: int = 2 ** 16
+    """The high-water mark of the buffer for outgoing data on each connection, in bytes."""
+
+    def serve_kwargs(self) -> dict[str, Any]:
+        """
+        Converts the options to keyword arguments for `websockets.serve`.
+        """
+        from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+
+        kwargs: dict[str, Any] = {
+            "compression": None,
+            "max_size": self.max_size,
+            "max_queue": self.max_queue,
+            "read_limit": self.read_limit,
+            "write_limit": self.write_limit
+        }
+        if self.compression_level is not None:
+            kwargs["extensions"] = [ServerPerMessageDeflateFactory(
+                server_no_context_takeover=self.no_context_takeover,
+                server_max_window_bits=self.max_window_bits,
+                client_max_window_bits=self.max_window_bits,
+                compress_settings={"level": self.compression_level, "memLevel": self.memory_level}
+            )]
+        return kwargs
@@ -1,16 +1,18 @@
 from __future__ import annotations
 import asyncio
 import logging
-import websockets as ws
-from netbound.packet import BasePacket, MalformedPacketError, UnknownPacketError
+from netbound.packet import BasePacket, DisconnectPacket, MalformedPacketError, UnknownPacketError
 from netbound.packet.serializer import BaseSerializer
 from netbound.state import BaseState
 from netbound.app.game import GameObject, GameObjectsSet
-from sqlalchemy.ext.asyncio import async_sessionmaker
-from typing import Callable, Coroutine, Any, Optional
+from typing import Callable, Coroutine, Any, Optional, TYPE_CHECKING
 from netbound.constants import EVERYONE
 from base64 import b64encode
 from netbound.app.logging_adapter import ProtocolLoggingAdapter
+from netbound.app.transport import BaseTransport, TransportClosedError
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
 
 class _GameProtocol:
     def __init__(
@@ -54,7 +56,7 @@ class _GameProtocol:
 
 class _PlayerProtocol(_GameProtocol):
     def __init__(self, 
-            websocket: ws.WebSocketServerProtocol, 
+            transport: BaseTransport, 
             pid: bytes,
             game_objects: set[GameObject], 
             disconnect_callback: Callable[[_GameProtocol, str], Coroutine[Any, Any, None]], 
@@ -62,21 +64,20 @@ class _PlayerProtocol(_GameProtocol):
             serializer: BaseSerializer
         ) -> None:
         super().__init__(pid, game_objects, db_session_callback, serializer)
-        self._websocket: ws.WebSocketServerProtocol = websocket
+        self._transport: BaseTransport = transport
         self._disconnect: Callable[[_GameProtocol, str], Coroutine[Any, Any, None]] = disconnect_callback
 
-    async def _start(self, initial_state: BaseState) -> None:
-        await super()._start(initial_state)
+    async def _listen(self) -> None:
         try:
-            await self._listen_websocket()
-        except ws.ConnectionClosedError:
+            await self._listen_transport()
+        except TransportClosedError:
             self._logger.debug(f"Connection closed")
             await self._disconnect(self, "Client disconnected")
 
-    async def _listen_websocket(self) -> None:
+    async def _listen_transport(self) -> None:
         self._logger.debug(f"Starting protocol")
 
-        async for message in self._websocket:
+        async for message in self._transport:
             if not isinstance(message, bytes):
                 self._logger.error(f"Received non-bytes message: {message}")
                 continue
@@ -93,6 +94,11 @@ class _PlayerProtocol(_GameProtocol):
                 self._logger.error(f"Unexpected error: {e}")
                 continue
 
+            if isinstance(p, DisconnectPacket):
+                # Only the server announces disconnects, so a client must not be able to fake one
+                self._logger.error(f"Received disconnect packet from client: {p}")
+                continue
+
             self._logger.debug(f"Received packet: {p}")
             
             # Store the packet in our local receive queue for processing next tick
@@ -1,24 +1,30 @@
+from __future__ import annotations
 import logging
 import asyncio
 import traceback
 from datetime import datetime
-from typing import Optional, Type, Iterable
-import websockets as ws
+from typing import Optional, Type, Iterable, TYPE_CHECKING
 from ssl import SSLContext
 from uuid import uuid4
-from netbound.packet import BasePacket, DisconnectPacket
+from netbound.packet import BasePacket, DisconnectPacket, MalformedPacketError
 from netbound.packet.serializer import BaseSerializer, MessagePackSerializer, register_packet
 from netbound.app.game import GameObject, GameObjectsSet
 from netbound.app.protocol import _GameProtocol, _PlayerProtocol
+from netbound.app.options import WebSocketOptions
+from netbound.app.transport import InMemoryClient, TransportClosedError, WebSocketTransport
 from netbound.constants import EVERYONE
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
-from sqlalchemy.ext.asyncio import AsyncEngine
+from netbound.cluster import ClusterDirectory, ClusterFrame
+from netbound.cluster.broker import BaseBroker
 from netbound.app.logging_adapter import ServerLoggingAdapter
 from netbound.state import BaseState
 from netbound import schedule
 from types import ModuleType
 from netbound.packet import Recipient, Recipients
 
+if TYPE_CHECKING:
+    import websockets as ws
+    from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
 class ServerApp:
     """
     The main server application. Instantiate this class to initialize the server to listen for incoming connections on 
@@ -33,8 +39,22 @@ class ServerApp:
     To run the server's main tickloop, call the `run` method with the desired ticks per second as the argument. This will 
     allow the server to start accepting incoming client packets and dispatching packets from the global queue at the desired 
     rate. This in turn will allow each connected client's internal state to be updated.
+
+    To spread players across several machines, call the `set_broker` method on each node with a 
+    `netbound.cluster.broker.BaseBroker` that links it to the others. Packets addressed to PIDs on other nodes will then 
+    be forwarded to them, and packets sent to `EVERYONE` will reach every node.
+
+    To attach simulated clients without opening any sockets (e.g. for tests or load tests), call the `connect_in_memory` 
+    method.
     """
-    def __init__(self, host: str, port: int, db_engine: AsyncEngine, ssl_context: Optional[SSLContext]=None) -> None:
+    def __init__(
+            self, 
+            host: str, 
+            port: int, 
+            db_engine: AsyncEngine, 
+            ssl_context: Optional[SSLContext]=None, 
+            websocket_options: Optional[WebSocketOptions]=None
+        ) -> None:
         """
         Initializes the server with the specified host, port, database engine and optional SSL context. 
 
@@ -54,21 +74,43 @@ class ServerApp:
         ssl_context.load_cert_chain(certfile, keyfile)
         ...
         ```
+
+        To tune permessage-deflate compression or the websocket buffer sizes, pass a `netbound.app.WebSocketOptions` 
+        object. For example:
+
+        ```
+        from netbound.app import WebSocketOptions
+        server = ServerApp("localhost", 8000, db_engine, websocket_options=WebSocketOptions(compression_level=1))
+        ```
         """
         self.host: str = host
         self.port: int = port
         self.ssl_context: Optional[SSLContext] = ssl_context
+        self.websocket_options: WebSocketOptions = websocket_options or WebSocketOptions()
 
         self._connected_protocols: dict[bytes, _GameProtocol] = {}
         self._game_objects: GameObjectsSet = GameObjectsSet()
         self._global_protos_packet_queue: asyncio.Queue[BasePacket] = asyncio.Queue()
     
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
         self._async_engine: AsyncEngine = db_engine
         self._async_session: async_sessionmaker = async_sessionmaker(bind=self._async_engine, class_=AsyncSession, expire_on_commit=False)
 
         self._logger: ServerLoggingAdapter = ServerLoggingAdapter(logging.getLogger(__name__))
         self._serializer: BaseSerializer = MessagePackSerializer()
 
+        self._broker: Optional[BaseBroker] = None
+        self._directory: ClusterDirectory = ClusterDirectory()
+        self._outbound_frames: dict[str, ClusterFrame] = {}
+        self._joined_pids: list[bytes] = []
+        self._left_pids: list[bytes] = []
+        self._linked_nodes: set[str] = set()
+        self._synced_nodes: set[str] = set()
+        self._resyncing_nodes: set[str] = set()
+
+        self._transport_tasks: set[asyncio.Task] = set()
+
         self.initial_state: BaseState | None = None  # This will be set by the the start method
 
     async def start(self, initial_state: Type[BaseState]) -> None:
@@ -77,19 +119,48 @@ class ServerApp:
         that connects. This, in turn, will be used to manage the client's internal state for sending and receiving packets. 
         The initial state must be a subclass of `netbound.state.BaseState`.
         """
+        import websockets as ws
+
         self.initial_state = initial_state
         self._logger.info(f"Starting server on {self.host}:{self.port}")
-        async with ws.serve(self._handle_connection, self.host, self.port, ssl=self.ssl_context):
+        if self._broker:
+            await self._broker.start()
+        async with ws.serve(self._handle_connection, self.host, self.port, ssl=self.ssl_context, **self.websocket_options.serve_kwargs()):
             await asyncio.Future()
 
-    async def add_npc(self, npc_initial_state: BaseState) -> None:
+    async def add_npc(self, npc_initial_state: Type[BaseState], client: Optional[InMemoryClient]=None) -> bytes:
         """
         Adds an NPC to the server. This will create a new connection with the specified initial state and add it to the 
-        list of connected protocols. This will allow the NPC to send and receive packets like any other connected client.
+        list of connected protocols. This will allow the NPC to send and receive packets like any other connected client. 
+        Returns the NPC's PID once its initial state has started.
+
+        By default, packets the NPC's states send to their client are dropped. To drive the NPC from the outside (e.g. from 
+        a bot running in the same process), pass a new `netbound.app.transport.InMemoryClient`. Its `pid` is set to the 
+        NPC's PID, and the server starts listening to it in the background once the initial state has started.
         """
-        proto: _GameProtocol = _GameProtocol(uuid4().bytes, self._game_objects, self._async_engine, self._serializer)
-        self._connected_protocols[proto._pid] = proto
+        if client:
+            return await self._attach_client(client, npc_initial_state)
+        proto: _GameProtocol = _GameProtocol(uuid4().bytes, self._game_objects, self._async_session, self._serializer)
+        self._register_protocol(proto)
         await proto._start(npc_initial_state)
+        return proto._pid
+
+    async def connect_in_memory(self, initial_state: Optional[Type[BaseState]]=None) -> InMemoryClient:
+        """
+        Attaches a simulated client to the server without opening a socket, and returns it. The client sends and receives 
+        serialized packets exactly like a websocket client, but through in-memory queues. This is useful for testing states 
+        and for load testing the server with many virtual players. The server does not need to be started with the `start` 
+        method for this, but its tick loop must be running.
+
+        The client's protocol starts in the specified initial state, or the server's initial state if none is specified. 
+        The state has started by the time the client is returned.
+        """
+        initial_state = initial_state or self.initial_state
+        if initial_state is None:
+            raise ValueError("An initial state is required to connect a client before the server has been started")
+        client: InMemoryClient = InMemoryClient()
+        await self._attach_client(client, initial_state)
+        return client
 
     def set_serializer(self, serializer: BaseSerializer) -> None:
         """
@@ -99,6 +170,18 @@ class ServerApp:
         """
         self._serializer = serializer
 
+    def set_broker(self, broker: BaseBroker) -> None:
+        """
+        Joins this server to a cluster of servers linked by the specified broker. Every node in the cluster should run 
+        the same initial state and register the same packets. Each tick, packets bound for other nodes are batched into 
+        one frame per node, together with the PIDs that connected to or disconnected from this node since the last tick. 
+        Whenever the link to another node comes up, that node is sent the full list of PIDs connected here and asked for 
+        its own full list in return, and whenever it goes down, the PIDs connected to that node are forgotten.
+
+        Use `netbound.cluster.broker.LoopbackBroker` to run several nodes in the same process (e.g. for testing), or 
+        `netbound.cluster.broker.TcpBroker` to link nodes running on different machines.
+        """
+        self._broker = broker
 
     def add_game_object(self, game_object: GameObject) -> None:
         """
@@ -107,15 +190,16 @@ class ServerApp:
         """
         self._game_objects.add(game_object)
 
-    def register_packets(self, packet_module: ModuleType) -> None:
+    def register_packets(self, packet_module: ModuleType, precompile: bool=False) -> None:
         """
         Registers all packet classes in the specified module. This is required for the server to recognize custom packets.
+
+        Packet validators are built the first time each packet class is used. Set `precompile` to `True` to build them 
+        all now instead, so the first packets of each class don't pay for it mid-tick.
         """
-        for packet_name in dir(packet_module):
-            if packet_name.endswith("Packet"):
-                packet_class = getattr(packet_module, packet_name)
-                if issubclass(packet_class, BasePacket):
-                    register_packet(packet_class)
+        for packet_name, packet_class in vars(packet_module).items():
+            if packet_name.endswith("Packet") and isinstance(packet_class, type) and issubclass(packet_class, BasePacket):
+                register_packet(packet_class, precompile)
 
     async def run(self, ticks_per_second: int) -> None:
         """
@@ -165,10 +249,28 @@ class ServerApp:
 
     async def _handle_connection(self, websocket: ws.WebSocketServerProtocol) -> None:
         self._logger.info(f"New connection from {websocket.remote_address}")
-        proto: _PlayerProtocol = _PlayerProtocol(websocket, uuid4().bytes, self._game_objects, self._disconnect_protocol, self._async_session, self._serializer)
-        self._connected_protocols[proto._pid] = proto
+        proto: _PlayerProtocol = _PlayerProtocol(WebSocketTransport(websocket), uuid4().bytes, self._game_objects, self._disconnect_protocol, self._async_session, self._serializer)
+        self._register_protocol(proto)
         await proto._start(self.initial_state)
+        await proto._listen()
+
+    async def _attach_client(self, client: InMemoryClient, initial_state: Type[BaseState]) -> bytes:
+        self._logger.info(f"New connection from {client.transport.remote_address}")
+        proto: _PlayerProtocol = _PlayerProtocol(client.transport, uuid4().bytes, self._game_objects, self._disconnect_protocol, self._async_session, self._serializer)
+        client.pid = proto._pid
+        self._register_protocol(proto)
+        await proto._start(initial_state)
+
+        # Unlike websocket connections, nothing else is awaiting this protocol, so keep a reference to its listening task
+        task: asyncio.Task = asyncio.ensure_future(proto._listen())
+        self._transport_tasks.add(task)
+        task.add_done_callback(self._transport_tasks.discard)
+        return proto._pid
 
+    def _register_protocol(self, proto: _GameProtocol) -> None:
+        self._connected_protocols[proto._pid] = proto
+        if self._broker:
+            self._joined_pids.append(proto._pid)
 
     async def _dispatch_packets(self) -> None:
         while not self._global_protos_packet_queue.empty():
@@ -180,6 +282,9 @@ class ServerApp:
                 self._logger.error(f"Packet {p} in the global protos queue was dropped because its list of recipients was empty")
                 continue
 
+            # The recipients of this packet that live on other nodes in the cluster, grouped by node
+            remote_pids: dict[str, list[bytes]] = {}
+
             for to_pid in to_pids:
                 if to_pid is None:
                     self._logger.error(f"Packet {p} in the global protos queue was dropped because its "
@@ -206,13 +311,97 @@ class ServerApp:
                         await proto._local_receive_packet_queue.put(p)
                             
                         self._logger.debug(f"Added {p.__class__.__name__} packet to {proto}'s receive queue")
+
+                    for node_id in self._linked_nodes:
+                        remote_pids[node_id] = [EVERYONE]
                 
                 # If we get to here, destination should be a specific PID
                 elif specific_to_proto := self._connected_protocols.get(to_pid):
                     await specific_to_proto._local_receive_packet_queue.put(p)
+                elif node_id := self._directory.node_of(to_pid):
+                    remote_pids.setdefault(node_id, []).append(to_pid)
                 else:
                     self._logger.error(f"Packet {p} was sent to a disconnected protocol")
 
+            for node_id, pids in remote_pids.items():
+                self._get_outbound_frame(node_id).packets.append((pids, p))
+                self._logger.debug(f"Added {p.__class__.__name__} packet to node {node_id}'s outbound frame")
+
+    def _get_outbound_frame(self, node_id: str) -> ClusterFrame:
+        if node_id not in self._outbound_frames:
+            self._outbound_frames[node_id] = ClusterFrame(self._broker.node_id)
+        return self._outbound_frames[node_id]
+
+    async def _update_cluster_links(self) -> None:
+        while not self._broker.link_events.empty():
+            node_id, up = await self._broker.link_events.get()
+            self._logger.info(f"Link to node {node_id} is {'up' if up else 'down'}")
+            # Either way, the node needs to be sent our full list of PIDs the next time its link is up
+            self._synced_nodes.discard(node_id)
+            if up:
+                self._linked_nodes.add(node_id)
+                # The node's PIDs may have been forgotten while the link was down, even if the node's own link to 
+                # this node stayed up, so ask it for its full list again
+                self._resyncing_nodes.add(node_id)
+            else:
+                self._linked_nodes.discard(node_id)
+                self._resyncing_nodes.discard(node_id)
+                self._directory.discard_node(node_id)
+
+    async def _receive_cluster_frames(self) -> None:
+        while not self._broker.inbound.empty():
+            data: bytes = await self._broker.inbound.get()
+            try:
+                frame: ClusterFrame = ClusterFrame.decode(data)
+            except MalformedPacketError as e:
+                self._logger.error(f"Dropped cluster frame: {e}")
+                continue
+
+            if frame.resync:
+                self._synced_nodes.discard(frame.node_id)
+            if frame.full:
+                self._directory.discard_node(frame.node_id)
+            for pid in frame.joined:
+                self._directory.add(pid, frame.node_id)
+            for pid in frame.left:
+                self._directory.discard(pid)
+
+            for to_pids, p in frame.packets:
+                if EVERYONE in to_pids:
+                    protos: Iterable[_GameProtocol] = self._connected_protocols.copy().values()
+                else:
+                    protos = [self._connected_protocols[pid] for pid in to_pids if pid in self._connected_protocols]
+                    if len(protos) < len(to_pids):
+                        self._logger.error(f"Packet {p} from node {frame.node_id} was sent to a disconnected protocol")
+                for proto in protos:
+                    await proto._local_receive_packet_queue.put(p)
+
+    async def _send_cluster_frames(self) -> None:
+        for node_id in self._linked_nodes:
+            frame: ClusterFrame = self._outbound_frames.pop(node_id, None) or ClusterFrame(self._broker.node_id)
+            if node_id in self._synced_nodes:
+                frame.joined = self._joined_pids
+                frame.left = self._left_pids
+            else:
+                # The link to this node has just come up, so tell it about every PID connected here. If this 
+                # frame is lost, the broker reports the link as down and the full list is sent again later
+                frame.joined = list(self._connected_protocols.keys())
+                frame.full = True
+                frame.resync = node_id in self._resyncing_nodes
+                self._synced_nodes.add(node_id)
+                self._resyncing_nodes.discard(node_id)
+
+            if frame:
+                await self._broker.send(node_id, frame.encode())
+
+        # Whatever is left was queued for nodes that are known to the directory, but whose link is down
+        for node_id, frame in self._outbound_frames.items():
+            for _, p in frame.packets:
+                self._logger.error(f"Packet {p} was dropped because the link to node {node_id} is down")
+        self._outbound_frames.clear()
+        self._joined_pids = []
+        self._left_pids = []
+
 
     async def _tick(self) -> None:
         # Grab the top outbound packet from each protocol and put it in the global queue
@@ -227,22 +416,39 @@ class ServerApp:
                 self._logger.debug(f"Popped {p_to_client.__class__.__name__} packet from {proto}'s client send queue")
                 await self._send_to_client(proto, p_to_client)
 
+        # Deliver packets forwarded by other nodes in the cluster to their respective protocols' inbound queues
+        if self._broker:
+            await self._update_cluster_links()
+            await self._receive_cluster_frames()
+
         # Dispatch all packets in the global proto-to-proto queue to their respective protocols' inbound queues
         await self._dispatch_packets()
+
+        # Forward packets bound for other nodes in the cluster, batched into one frame per node
+        if self._broker:
+            await self._send_cluster_frames()
         
         # Process all inbound packets for each protocol
         for _, proto in self._connected_protocols.copy().items():
             await proto._process_packets()
 
     async def _disconnect_protocol(self, proto: _GameProtocol, reason: str) -> None:
+        if proto._pid not in self._connected_protocols:
+            return  # Already disconnected, e.g. by a failed send before the transport noticed
         self._logger.info(f"Disconnecting {proto}: {reason}")
         await proto._state._on_disconnect()
         self._connected_protocols.pop(proto._pid)
+        if self._broker:
+            self._left_pids.append(proto._pid)
         await self._global_protos_packet_queue.put(DisconnectPacket(from_pid=proto._pid, to_pid=EVERYONE, reason=reason))
 
     async def _send_to_client(self, proto: _PlayerProtocol, p: BasePacket) -> None:
+        if not isinstance(proto, _PlayerProtocol):
+            self._logger.debug(f"Dropped {p.__class__.__name__} packet because {proto} has no client")
+            return
+
         try:
-            await proto._websocket.send(self._serializer.serialize(p))
-        except ws.ConnectionClosed as e:
+            await proto._transport.send(self._serializer.serialize(p))
+        except TransportClosedError as e:
             self._logger.error(f"Connection closed: {e}")
             await self._disconnect_protocol(proto, "Connection closed")
\ No newline at end of file
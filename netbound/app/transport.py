@@ -0,0 +1,148 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Optional, TYPE_CHECKING
+from netbound.packet.serializer import MessagePackSerializer
+import asyncio
+
+if TYPE_CHECKING:
+    import websockets as ws
+    from netbound.packet import BasePacket
+
+class TransportClosedError(ConnectionError):
+    pass
+
+class BaseTransport(ABC):
+    """
+    Carries serialized packets between a client and its protocol on the server. Iterating over the
+    transport yields each message received from the client, and stops when the client disconnects
+    cleanly. Both iterating and sending raise `TransportClosedError` if the connection is lost.
+    """
+    remote_address: Any = None
+    """
+    The address of the client, used for logging.
+    """
+
+    @abstractmethod
+    def __aiter__(self) -> AsyncIterator[bytes | str]:
+        pass
+
+    @abstractmethod
+    async def send(self, data: bytes) -> None:
+        """
+        Sends a serialized packet to the client.
+        """
+        pass
+
+class WebSocketTransport(BaseTransport):
+    """
+    The transport used for clients connecting over a websocket.
+    """
+    def __init__(self, websocket: ws.WebSocketServerProtocol) -> None:
+        self._websocket: ws.WebSocketServerProtocol = websocket
+        self.remote_address: Any = websocket.remote_address
+
+    async def __aiter__(self) -> AsyncIterator[bytes | str]:
+        import websockets as ws
+
+        try:
+            async for message in self._websocket:
+                yield message
+        except ws.ConnectionClosedError as e:
+            raise TransportClosedError(str(e)) from e
+
+    async def send(self, data: bytes) -> None:
+        import websockets as ws
+
+        try:
+            await self._websocket.send(data)
+        except ws.ConnectionClosed as e:
+            raise TransportClosedError(str(e)) from e
+
+class InMemoryTransport(BaseTransport):
+    """
+    The server's end of an `InMemoryClient`. Messages are passed through queues, so no sockets are
+    involved.
+    """
+    def __init__(self, to_server: asyncio.Queue[Optional[bytes]], to_client: asyncio.Queue[Optional[bytes]]) -> None:
+        self._to_server: asyncio.Queue[Optional[bytes]] = to_server
+        self._to_client: asyncio.Queue[Optional[bytes]] = to_client
+        self._closed: bool = False
+        self.remote_address: Any = "in-memory"
+
+    async def __aiter__(self) -> AsyncIterator[bytes | str]:
+        # A None in the queue means the client disconnected
+        while (message := await self._to_server.get()) is not None:
+            yield message
+        self._closed = True
+
+    async def send(self, data: bytes) -> None:
+        if self._closed:
+            raise TransportClosedError("In-memory client disconnected")
+        await self._to_client.put(data)
+
+class InMemoryClient:
+    """
+    A simulated client attached directly to a server with `ServerApp.connect_in_memory`. It sends and
+    receives the same serialized packets a websocket client would, which makes it useful for testing
+    states and load testing the server without the cost of sockets and TLS. For example:
+
+    ```
+    client = await server.connect_in_memory(ChatState)
+    await client.send_packet(ChatPacket(from_pid=client.pid, msg="Hello"))
+    reply = await client.recv_packet()
+    await client.close()
+    ```
+
+    `send_packet` and `recv_packet` encode packets the way a real client does, which assumes the server
+    uses a plain `MessagePackSerializer`. Use `send` and `recv` to exchange raw bytes with servers using
+    any other serializer.
+    """
+    def __init__(self) -> None:
+        self._to_server: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+        self._to_client: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+        self._serializer: MessagePackSerializer = MessagePackSerializer()
+        self.transport: InMemoryTransport = InMemoryTransport(self._to_server, self._to_client)
+        self.pid: Optional[bytes] = None
+        """The PID of the protocol this client is attached to. This is set by the server when it attaches the client."""
+
+    async def send(self, data: bytes) -> None:
+        """
+        Sends a serialized packet to the server.
+        """
+        await self._to_server.put(data)
+
+    async def recv(self) -> bytes:
+        """
+        Waits for the next serialized packet from the server. Raises `TransportClosedError` if the
+        client has been closed.
+        """
+        data: Optional[bytes] = await self._to_client.get()
+        if data is None:
+            raise TransportClosedError("In-memory client closed")
+        return data
+
+    async def send_packet(self, packet: BasePacket) -> None:
+        """
+        Serializes a packet the way a real client does and sends it to the server.
+        """
+        await self.send(self._serializer.serialize_as_client(packet))
+
+    async def recv_packet(self) -> BasePacket:
+        """
+        Waits for the next packet from the server and deserializes it. Raises `TransportClosedError`
+        if the client has been closed.
+        """
+        return self._serializer.deserialize_as_client(await self.recv())
+
+    def pending(self) -> int:
+        """
+        Returns the number of packets from the server waiting to be received.
+        """
+        return self._to_client.qsize()
+
+    async def close(self) -> None:
+        """
+        Disconnects the client from the server.
+        """
+        await self._to_server.put(None)
+        await self._to_client.put(None)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+from netbound.packet import BasePacket, MalformedPacketError, UnknownPacketError
+from typing import Any, Optional, Type
+from netbound.packet.serializer import get_packet_class
+from pydantic import ValidationError
+from dataclasses import dataclass, field
+import logging
+import msgpack
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+class ClusterDirectory:
+    """
+    Keeps track of which node in the cluster each remote PID lives on. Every node keeps its own
+    directory, which is kept up to date by the membership changes carried in each `ClusterFrame`.
+    PIDs connected to the local node are not stored here (they live in the server's own list of
+    connected protocols).
+    """
+    def __init__(self) -> None:
+        self._pid_nodes: dict[bytes, str] = {}
+
+    def add(self, pid: bytes, node_id: str) -> None:
+        """Record that the specified PID is connected to the specified node."""
+        self._pid_nodes[pid] = node_id
+
+    def discard(self, pid: bytes) -> None:
+        """Forget about the specified PID, if it is known."""
+        self._pid_nodes.pop(pid, None)
+
+    def discard_node(self, node_id: str) -> None:
+        """Forget about every PID connected to the specified node, e.g. when its link goes down."""
+        self._pid_nodes = {pid: node for pid, node in self._pid_nodes.items() if node != node_id}
+
+    def node_of(self, pid: bytes) -> Optional[str]:
+        """Get the ID of the node the specified PID is connected to, or `None` if it is not known."""
+        return self._pid_nodes.get(pid)
+
+    def __contains__(self, pid: bytes) -> bool:
+        return pid in self._pid_nodes
+
+    def __len__(self) -> int:
+        return len(self._pid_nodes)
+
+
+@dataclass
+class ClusterFrame:
+    """
+    A batch of everything one node has to tell another node in a single tick: the PIDs that joined
+    or left the sending node since the last frame, and the packets addressed to PIDs on the receiving
+    node. Each entry in `packets` is a tuple of the recipient PIDs on the receiving node (or just
+    `[EVERYONE]`) and the packet itself.
+
+    If `full` is set, `joined` is the complete list of PIDs on the sending node, and replaces whatever
+    the receiving node knew about it before. If `resync` is set, the sending node has lost track of
+    the receiving node's PIDs, and asks to be sent a full list of them.
+    """
+    node_id: str
+    joined: list[bytes] = field(default_factory=list)
+    left: list[bytes] = field(default_factory=list)
+    packets: list[tuple[list[bytes], BasePacket]] = field(default_factory=list)
+    full: bool = False
+    resync: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.full or self.resync or self.joined or self.left or self.packets)
+
+    def encode(self) -> bytes:
+        """
+        Converts the frame to a MessagePack-encoded byte string to be sent to another node. Unlike the
+        client-facing serializer, PIDs are kept as raw bytes since both ends of the link are servers.
+        """
+        packets: list[list[Any]] = []
+        for to_pids, p in self.packets:
+            data: dict[str, Any] = p.model_dump()
+            if p.to_pid is not None and not isinstance(p.to_pid, bytes):
+                data["to_pid"] = list(p.to_pid)
+            packets.append([list(to_pids), p.__class__.__name__, data])
+
+        return msgpack.packb({
+            "node": self.node_id,
+            "joined": self.joined,
+            "left": self.left,
+            "packets": packets,
+            "full": self.full,
+            "resync": self.resync
+        }, use_bin_type=True)
+
+    @classmethod
+    def decode(cls, data: bytes) -> ClusterFrame:
+        """
+        Converts a MessagePack-encoded byte string back to a frame. Raises `MalformedPacketError` if
+        the frame itself or its membership lists are invalid. Invalid packet entries, e.g. of a packet
+        class that has not been registered on this node yet, are logged and left out, so that the
+        frame's membership changes are never lost because of them.
+        """
+        try:
+            frame_dict: dict[str, Any] = msgpack.unpackb(data, raw=False)
+            frame: ClusterFrame = cls(frame_dict["node"], frame_dict["joined"], frame_dict["left"])
+            raw_packets: list[list[Any]] = frame_dict["packets"]
+            frame.full = frame_dict["full"]
+            frame.resync = frame_dict["resync"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise MalformedPacketError(f"Cluster frame is malformed: {e}")
+
+        if not isinstance(frame.node_id, str) or not isinstance(frame.full, bool) or not isinstance(frame.resync, bool) or not _is_pid_list(frame.joined) or not _is_pid_list(frame.left):
+            raise MalformedPacketError("Cluster frame has an invalid node ID or membership list")
+        if not isinstance(raw_packets, list):
+            raise MalformedPacketError("Cluster frame has an invalid packet list")
+
+        for entry in raw_packets:
+            try:
+                frame.packets.append(_decode_packet_entry(entry))
+            except (MalformedPacketError, UnknownPacketError) as e:
+                _logger.error(f"Dropped packet from node {frame.node_id}: {e}")
+        return frame
+
+
+def _decode_packet_entry(entry: Any) -> tuple[list[bytes], BasePacket]:
+    try:
+        to_pids, packet_name, packet_data = entry
+    except (ValueError, TypeError) as e:
+        raise MalformedPacketError(f"Cluster frame has a malformed packet entry: {e}")
+    if not _is_pid_list(to_pids) or not isinstance(packet_name, str) or not isinstance(packet_data, dict):
+        raise MalformedPacketError(f"Cluster frame has a malformed packet entry: {entry}")
+
+    packet_class: Type[BasePacket] = get_packet_class(packet_name)
+    try:
+        return to_pids, packet_class.model_validate(packet_data)
+    except ValidationError as e:
+        raise MalformedPacketError(f"Packet data {packet_data} does not match expected schema: {e}")
+
+
+def _is_pid_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(pid, bytes) for pid in value)
+
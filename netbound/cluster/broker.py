@@ -0,0 +1,225 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+import asyncio
+import logging
+
+class BaseBroker(ABC):
+    """
+    Moves encoded `netbound.cluster.ClusterFrame`s between the nodes of a cluster. Frames received
+    from other nodes are put in the `inbound` queue, which the server drains once per tick.
+
+    Whenever the link to another node comes up or goes down, the broker puts `(node_id, True)` or
+    `(node_id, False)` in the `link_events` queue. The server only sends frames to nodes whose link
+    is up, exchanges full lists of PIDs with each of them whenever their link comes up, and forgets
+    the PIDs of nodes whose link goes down.
+    """
+    def __init__(self, node_id: str) -> None:
+        self.node_id: str = node_id
+        self.inbound: asyncio.Queue[bytes] = asyncio.Queue()
+        self.link_events: asyncio.Queue[tuple[str, bool]] = asyncio.Queue()
+
+    async def start(self) -> None:
+        """
+        Starts accepting frames from other nodes and linking up with them. By default, this method
+        does nothing.
+        """
+        pass
+
+    async def stop(self) -> None:
+        """
+        Stops accepting frames from other nodes and releases any open connections. By default, this
+        method does nothing.
+        """
+        pass
+
+    @abstractmethod
+    def peers(self) -> Iterable[str]:
+        """
+        Returns the IDs of every other node in the cluster, whether or not their link is up.
+        """
+        pass
+
+    @abstractmethod
+    async def send(self, node_id: str, frame: bytes) -> None:
+        """
+        Sends an encoded frame to the specified node. This must not wait on the network, since it is
+        called from the server's tick loop. Frames that cannot be delivered are dropped, and the link
+        to the node is reported as down.
+        """
+        pass
+
+
+class LoopbackHub:
+    """
+    Connects any number of `LoopbackBroker`s living in the same process. This is useful for testing
+    a cluster without opening any sockets, e.g.
+    ```
+    hub = LoopbackHub()
+    server_a.set_broker(LoopbackBroker("a", hub))
+    server_b.set_broker(LoopbackBroker("b", hub))
+    ```
+    """
+    def __init__(self) -> None:
+        self._brokers: dict[str, LoopbackBroker] = {}
+
+
+class LoopbackBroker(BaseBroker):
+    """
+    A broker that hands frames straight to the inbound queue of another broker attached to the same
+    `LoopbackHub`. Links come up when a broker is started and go down when it is stopped.
+    """
+    def __init__(self, node_id: str, hub: LoopbackHub) -> None:
+        super().__init__(node_id)
+        self._hub: LoopbackHub = hub
+
+    async def start(self) -> None:
+        for broker in self._hub._brokers.values():
+            broker.link_events.put_nowait((self.node_id, True))
+            self.link_events.put_nowait((broker.node_id, True))
+        self._hub._brokers[self.node_id] = self
+
+    async def stop(self) -> None:
+        if self._hub._brokers.pop(self.node_id, None):
+            for broker in self._hub._brokers.values():
+                broker.link_events.put_nowait((self.node_id, False))
+
+    def peers(self) -> Iterable[str]:
+        return [node_id for node_id in self._hub._brokers if node_id != self.node_id]
+
+    async def send(self, node_id: str, frame: bytes) -> None:
+        if broker := self._hub._brokers.get(node_id):
+            broker.inbound.put_nowait(frame)
+
+
+class TcpBroker(BaseBroker):
+    """
+    A broker that sends frames to other nodes over plain TCP connections. Each frame is prefixed with
+    its length as a 4-byte big-endian integer.
+
+    Each peer has its own outbound queue and a background task that writes it to the peer's socket,
+    so a slow or unreachable peer never holds up the server's tick loop. The task keeps trying to
+    connect to its peer, waiting `reconnect_delay` seconds after a failure and doubling the wait after
+    each further failure, up to `max_reconnect_delay`. A peer that does not accept a connection within
+    `connect_timeout` seconds, or does not take a frame within `write_timeout` seconds, is treated as
+    down. If more than `max_queued_frames` frames are waiting for a peer, new frames are dropped.
+
+    The cluster membership is static: every node must be given the address of every other node, e.g.
+    ```
+    peers = {"a": ("10.0.0.1", 9000), "b": ("10.0.0.2", 9000)}
+    server.set_broker(TcpBroker("a", "0.0.0.0", 9000, peers))
+    ```
+    Any entry for this node's own ID in `peers` is ignored. The links between nodes are not encrypted,
+    so they should only be exposed on a private network.
+    """
+    HEADER_SIZE: int = 4
+
+    def __init__(
+            self, 
+            node_id: str, 
+            host: str, 
+            port: int, 
+            peers: dict[str, tuple[str, int]], 
+            connect_timeout: float=5, 
+            write_timeout: float=5, 
+            reconnect_delay: float=0.5, 
+            max_reconnect_delay: float=30, 
+            max_queued_frames: int=1024
+        ) -> None:
+        super().__init__(node_id)
+        self.host: str = host
+        self.port: int = port
+        self.connect_timeout: float = connect_timeout
+        self.write_timeout: float = write_timeout
+        self.reconnect_delay: float = reconnect_delay
+        self.max_reconnect_delay: float = max_reconnect_delay
+        self._peer_addresses: dict[str, tuple[str, int]] = {k: v for k, v in peers.items() if k != node_id}
+        self._outboxes: dict[str, asyncio.Queue[bytes]] = {k: asyncio.Queue(max_queued_frames) for k in self._peer_addresses}
+        self._link_tasks: list[asyncio.Task] = []
+        self._peer_writers: set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._logger: logging.Logger = logging.getLogger(__name__)
+
+    async def start(self) -> None:
+        self._logger.info(f"Starting cluster broker {self.node_id} on {self.host}:{self.port}")
+        self._server = await asyncio.start_server(self._handle_peer, self.host, self.port)
+        self._link_tasks = [asyncio.ensure_future(self._run_link(node_id)) for node_id in self._peer_addresses]
+
+    async def stop(self) -> None:
+        for task in self._link_tasks:
+            task.cancel()
+        await asyncio.gather(*self._link_tasks, return_exceptions=True)
+        self._link_tasks = []
+        if self._server:
+            self._server.close()
+            for writer in self._peer_writers:
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def peers(self) -> Iterable[str]:
+        return self._peer_addresses.keys()
+
+    async def send(self, node_id: str, frame: bytes) -> None:
+        try:
+            self._outboxes[node_id].put_nowait(frame)
+        except asyncio.QueueFull:
+            self._logger.error(f"Dropped frame for node {node_id} because too many frames are waiting to be sent to it")
+
+    async def _run_link(self, node_id: str) -> None:
+        host, port = self._peer_addresses[node_id]
+        outbox: asyncio.Queue[bytes] = self._outboxes[node_id]
+        delay: float = self.reconnect_delay
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.connect_timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                self._logger.debug(f"Could not connect to node {node_id}: {e!r}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            self._logger.info(f"Linked to node {node_id}")
+            self.link_events.put_nowait((node_id, True))
+            delay = self.reconnect_delay
+
+            # Peers never send anything back on this connection, so reading only returns once it closes
+            writing: asyncio.Task = asyncio.ensure_future(self._write_frames(writer, outbox))
+            closing: asyncio.Task = asyncio.ensure_future(reader.read())
+            try:
+                done, _ = await asyncio.wait({writing, closing}, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+                self._logger.warning(f"Lost link to node {node_id}: connection closed")
+            except (OSError, asyncio.TimeoutError) as e:
+                self._logger.warning(f"Lost link to node {node_id}: {e!r}")
+            finally:
+                writing.cancel()
+                closing.cancel()
+                writer.close()
+                # Anything still queued was meant for the old link, and the server will resend its 
+                # full list of PIDs when the link comes back up
+                while not outbox.empty():
+                    outbox.get_nowait()
+                self.link_events.put_nowait((node_id, False))
+            await asyncio.sleep(delay)
+
+    async def _write_frames(self, writer: asyncio.StreamWriter, outbox: asyncio.Queue[bytes]) -> None:
+        while True:
+            frame: bytes = await outbox.get()
+            writer.write(len(frame).to_bytes(self.HEADER_SIZE, "big") + frame)
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._logger.debug(f"Cluster connection from {writer.get_extra_info('peername')}")
+        self._peer_writers.add(writer)
+        try:
+            while True:
+                header: bytes = await reader.readexactly(self.HEADER_SIZE)
+                frame: bytes = await reader.readexactly(int.from_bytes(header, "big"))
+                await self.inbound.put(frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self._logger.debug(f"Cluster connection from {writer.get_extra_info('peername')} closed")
+        finally:
+            self._peer_writers.discard(writer)
+            writer.close()
@@ -10,6 +10,9 @@ Recipients = Optional[Union[List[Recipient], KeysView[Recipient], Set[Recipient]
 class BasePacket(BaseModel, ABC):
     class Config:
         arbitrary_types_allowed = True
+        # Build validators when a packet class is first used (or registered with `precompile=True`) 
+        # rather than when it is defined, which keeps importing large packet modules fast
+        defer_build = True
 
     """
     The base packet class. All user-defined packets must inherit from this class.
@@ -33,6 +36,12 @@ class BasePacket(BaseModel, ABC):
     from the list of recipients. This can be useful to avoid infinite loops when broadcasting 
     packets.
     """
+
+    compressible_class: ClassVar[bool] = False
+    """
+    Whether packets of this class may be compressed by a `CompressingSerializer`. Set this with the 
+    `compressible` decorator rather than directly.
+    """
     
     def __repr__(self) -> str:
         TO_PID: str = "to_pid"
@@ -58,6 +67,12 @@ class BasePacket(BaseModel, ABC):
     def __str__(self) -> str:
         return self.__repr__()
     
+def compressible(class_: Type[BasePacket]) -> Type[BasePacket]:
+    """A decorator that allows a `CompressingSerializer` to compress packets of the class when they are 
+    large enough. Only use this for packets that are large and repetitive, like map chunks."""
+    class_.compressible_class = True
+    return class_
+
 class DisconnectPacket(BasePacket):
     """
     A packet that is broadcasted to all protocols when one protocol disconnects from the server.
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Iterable, Optional
+from netbound.packet import MalformedPacketError
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class BaseCompressor(ABC):
+    """
+    Compresses the serialized bytes of large packets. Both ends of the connection must use the same
+    compressor, with the same dictionary (if any).
+    """
+    dictionary: Optional[bytes] = None
+    """
+    The shared dictionary used to prime the compressor, if any. Send this to clients ahead of time so
+    they can decompress packets.
+    """
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compresses the data.
+        """
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes, max_size: int) -> bytes:
+        """
+        Decompresses the data. Raises `MalformedPacketError` if the data is invalid or would decompress
+        to more than `max_size` bytes.
+        """
+        pass
+
+class ZlibCompressor(BaseCompressor):
+    MAX_DICTIONARY_SIZE: int = 32768
+    """Zlib can only look back 32 KiB, so any more dictionary than this is wasted."""
+
+    DICTIONARY_HEADER_SIZE: int = 6
+    """The size of a zlib stream header that refers to a preset dictionary: 2 header bytes and the dictionary's ID."""
+
+    def __init__(self, level: int=6, dictionary: Optional[bytes]=None) -> None:
+        """
+        Creates a compressor using the zlib format at the specified level (0-9), optionally primed with
+        a preset dictionary. Clients can decompress the data with any zlib inflate implementation.
+        """
+        self.level: int = level
+        self.dictionary: Optional[bytes] = dictionary[-self.MAX_DICTIONARY_SIZE:] if dictionary else None
+        # Loading the dictionary is much slower than copying a compressor that has already loaded it
+        self._primed_compressor = zlib.compressobj(level, zdict=self.dictionary) if self.dictionary else zlib.compressobj(level)
+
+        # A decompressor only loads the dictionary once it has read the stream's header, which is the same for every 
+        # stream compressed with this level and dictionary. Feed it that header now so copies start ready to inflate
+        self._header: bytes = self.compress(b"")[:self.DICTIONARY_HEADER_SIZE] if self.dictionary else b""
+        self._primed_decompressor = self._new_decompressor()
+        self._primed_decompressor.decompress(self._header)
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self._primed_compressor.copy()
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes, max_size: int) -> bytes:
+        if data.startswith(self._header):
+            decompressor = self._primed_decompressor.copy()
+            data = data[len(self._header):]
+        else:
+            # E.g. a client compressed this at a different level, so it has a different header
+            decompressor = self._new_decompressor()
+        try:
+            decompressed: bytes = decompressor.decompress(data, max_size)
+        except zlib.error as e:
+            raise MalformedPacketError(f"Packet could not be decompressed: {e}")
+        if decompressor.unconsumed_tail:
+            raise MalformedPacketError(f"Packet decompresses to more than {max_size} bytes")
+        if not decompressor.eof:
+            raise MalformedPacketError("Packet is truncated")
+        return decompressed
+
+    def _new_decompressor(self):
+        return zlib.decompressobj(zdict=self.dictionary) if self.dictionary else zlib.decompressobj()
+
+    @classmethod
+    def train_dictionary(cls, samples: Iterable[bytes], size: int=MAX_DICTIONARY_SIZE, segment_size: int=8) -> bytes:
+        """
+        Builds a preset dictionary from recorded packets, e.g. the samples of a `RecordingSerializer`.
+        Zlib has no trainer of its own, so this picks the byte segments found in the most samples, with
+        the most common segments last (zlib finds matches near the end of the dictionary most cheaply).
+        """
+        counts: Counter[bytes] = Counter()
+        for sample in samples:
+            counts.update({sample[i:i + segment_size] for i in range(0, len(sample) - segment_size + 1)})
+
+        segments: list[bytes] = []
+        total: int = 0
+        for segment, count in counts.most_common():
+            if count < 2 or total + len(segment) > size:
+                break
+            segments.append(segment)
+            total += len(segment)
+        return b"".join(reversed(segments))
+
+class ZstdCompressor(BaseCompressor):
+    def __init__(self, level: int=3, dictionary: Optional[bytes]=None) -> None:
+        """
+        Creates a compressor using the Zstandard format at the specified level (1-22), optionally primed
+        with a dictionary. This requires the optional `zstandard` package.
+        """
+        if zstandard is None:
+            raise ImportError("ZstdCompressor requires the zstandard package (pip install zstandard)")
+        self.level: int = level
+        self.dictionary: Optional[bytes] = dictionary
+        dict_data: Optional[zstandard.ZstdCompressionDict] = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        self._compressor: zstandard.ZstdCompressor = zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+        self._decompressor: zstandard.ZstdDecompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes, max_size: int) -> bytes:
+        try:
+            if zstandard.frame_content_size(data) > max_size:
+                raise MalformedPacketError(f"Packet decompresses to more than {max_size} bytes")
+            return self._decompressor.decompress(data, max_output_size=max_size)
+        except zstandard.ZstdError as e:
+            raise MalformedPacketError(f"Packet could not be decompressed: {e}")
+
+    @classmethod
+    def train_dictionary(cls, samples: Iterable[bytes], size: int=16384) -> bytes:
+        """
+        Trains a dictionary of the specified size from recorded packets, e.g. the samples of a
+        `RecordingSerializer`. Zstandard needs a few hundred samples to train a useful dictionary.
+        """
+        if zstandard is None:
+            raise ImportError("ZstdCompressor requires the zstandard package (pip install zstandard)")
+        return zstandard.train_dictionary(size, list(samples)).as_bytes()
@@ -1,11 +1,15 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from netbound.packet import BasePacket, MalformedPacketError, UnknownPacketError
+from netbound.packet import BasePacket, DisconnectPacket, MalformedPacketError, UnknownPacketError
 from pydantic import ValidationError
-from typing import Any, Type
+from netbound.packet.compression import BaseCompressor
+from typing import Any, Optional, Type
 import base64
 import msgpack
 
+# Built-in packets the server sends to clients are registered from the start
+_registered_packets: dict[str, Type[BasePacket]] = {"disconnectpacket": DisconnectPacket}
+
 class BaseSerializer(ABC):
     @abstractmethod
     def serialize(self, packet: BasePacket) -> bytes:
@@ -29,18 +33,47 @@ class MessagePackSerializer(BaseSerializer):
         Converts the packet to a MessagePack-encoded byte string to be sent over the network. The 
         PID values are sent as base64-encoded strings.
         """
-        data = {}
-        packet_name = packet.__class__.__name__.removesuffix("Packet").title()
-        m_dump = packet.model_dump()
-
-        data[packet_name] = m_dump
-        return msgpack.packb(data, use_bin_type=True)
+        return self._serialize(packet, encode_pids=False)
     
     def deserialize(self, packet: bytes) -> BasePacket:
         """
         Converts a MessagePack-encoded byte string to a packet object. The returned object will be an 
         instance of the specific packet class that the packet data corresponds to.
         """
+        return self._deserialize(packet, decode_pids=True)
+
+    def serialize_as_client(self, packet: BasePacket) -> bytes:
+        """
+        Converts the packet to a MessagePack-encoded byte string the way a client sends it to the 
+        server, i.e. with its PIDs as base64-encoded strings and without a `to_pid` if it has none. 
+        This is used by simulated clients like `netbound.app.transport.InMemoryClient`.
+        """
+        return self._serialize(packet, encode_pids=True)
+
+    def deserialize_as_client(self, packet: bytes) -> BasePacket:
+        """
+        Converts a MessagePack-encoded byte string produced by `serialize` back to a packet object, 
+        the way a client receives it from the server (with its PIDs as raw bytes).
+        """
+        return self._deserialize(packet, decode_pids=False)
+
+    def _serialize(self, packet: BasePacket, encode_pids: bool) -> bytes:
+        data = {}
+        packet_name = packet.__class__.__name__.removesuffix("Packet").title()
+        m_dump = packet.model_dump()
+
+        # Clients send PIDs as b64-encoded strings, and leave them out if they have none
+        if encode_pids:
+            for _pid_key in ["to_pid", "from_pid"]:
+                if m_dump.get(_pid_key) is None:
+                    m_dump.pop(_pid_key, None)
+                else:
+                    m_dump[_pid_key] = base64.b64encode(m_dump[_pid_key]).decode()
+
+        data[packet_name] = m_dump
+        return msgpack.packb(data, use_bin_type=True)
+
+    def _deserialize(self, packet: bytes, decode_pids: bool) -> BasePacket:
         try:
             packet_dict: dict[str, Any] = msgpack.unpackb(packet, raw=False)
         except msgpack.StackError:
@@ -62,32 +95,95 @@ class MessagePackSerializer(BaseSerializer):
         packet_data: dict = packet_dict[packet_name]
         
         # PIDs are sent as b64-encoded strings, but we need them as bytes
-        for _pid_key in ["to_pid", "from_pid"]:
-            if _pid_key in packet_data:
-                packet_data[_pid_key] = base64.b64decode(packet_data[_pid_key])
-
-
-        class_name: str = packet_name.lower() + "packet"
-        packet_class = None
-        for _name, _class in globals().items():
-            if _name.lower() == class_name:
-                packet_class = _class
-                break
-        if packet_class is None:
-            raise UnknownPacketError(f"Packet name not recognized: {packet_name}")
+        if decode_pids:
+            for _pid_key in ["to_pid", "from_pid"]:
+                if _pid_key in packet_data:
+                    packet_data[_pid_key] = base64.b64decode(packet_data[_pid_key])
+
+
+        packet_class: Type[BasePacket] = get_packet_class(packet_name.lower() + "packet")
         
         try:
-            packet_class.model_validate(packet_data)
+            return packet_class.model_validate(packet_data)
         except ValidationError as e:
             raise MalformedPacketError(f"Packet data {packet_data} does not match expected schema: {e}")
 
-        try:
-            return packet_class(**packet_data)
-        except TypeError as e:
-            raise MalformedPacketError(f"Packet data does not match expected signature: {e}")
+class CompressingSerializer(BaseSerializer):
+    COMPRESSED_PREFIX: bytes = b"\xc1"
+    """
+    The first byte of every compressed packet. MessagePack never uses this byte, so clients can tell 
+    compressed packets apart from plain ones.
+    """
+
+    def __init__(
+            self, 
+            compressor: BaseCompressor, 
+            threshold: int=1024, 
+            serializer: Optional[BaseSerializer]=None, 
+            max_decompressed_size: int=2 ** 20
+        ) -> None:
+        """
+        Wraps another serializer (a `MessagePackSerializer` by default) so that packets of classes 
+        decorated with `netbound.packet.compressible` are compressed when their serialized form is at 
+        least `threshold` bytes long. All other packets are sent exactly as the wrapped serializer 
+        produces them. Compressed packets are sent as `COMPRESSED_PREFIX` followed by the compressed 
+        data.
+
+        Compressed packets from clients are accepted too, as long as they decompress to no more than 
+        `max_decompressed_size` bytes.
+        """
+        self.compressor: BaseCompressor = compressor
+        self.threshold: int = threshold
+        self.serializer: BaseSerializer = serializer or MessagePackSerializer()
+        self.max_decompressed_size: int = max_decompressed_size
+
+    def serialize(self, packet: BasePacket) -> bytes:
+        data: bytes = self.serializer.serialize(packet)
+        if packet.compressible_class and len(data) >= self.threshold:
+            return self.COMPRESSED_PREFIX + self.compressor.compress(data)
+        return data
+
+    def deserialize(self, data: bytes) -> BasePacket:
+        if data.startswith(self.COMPRESSED_PREFIX):
+            data = self.compressor.decompress(data[len(self.COMPRESSED_PREFIX):], self.max_decompressed_size)
+        return self.serializer.deserialize(data)
+
+class RecordingSerializer(BaseSerializer):
+    def __init__(self, serializer: Optional[BaseSerializer]=None, max_samples: int=10000) -> None:
+        """
+        Wraps another serializer (a `MessagePackSerializer` by default) and keeps a copy of the first 
+        `max_samples` serialized packets of classes decorated with `netbound.packet.compressible`. Use 
+        the recorded `samples` to train a dictionary for a compressor, e.g. 
+        `ZstdCompressor.train_dictionary(recorder.samples)`.
+        """
+        self.serializer: BaseSerializer = serializer or MessagePackSerializer()
+        self.max_samples: int = max_samples
+        self.samples: list[bytes] = []
+
+    def serialize(self, packet: BasePacket) -> bytes:
+        data: bytes = self.serializer.serialize(packet)
+        if packet.compressible_class and len(self.samples) < self.max_samples:
+            self.samples.append(data)
+        return data
+
+    def deserialize(self, data: bytes) -> BasePacket:
+        return self.serializer.deserialize(data)
+
+def register_packet(packet: Type[BasePacket], precompile: bool=False) -> None:
+    """
+    Registers a user-defined packet class so that it can be deserialized. If `precompile` is `True`, 
+    the packet's validator is built now instead of when the first packet of this class is received.
+    """
+    _registered_packets[packet.__name__.lower()] = packet
+    if precompile:
+        packet.model_rebuild(force=True)
 
-def register_packet(packet: Type[BasePacket]) -> None:
+def get_packet_class(class_name: str) -> Type[BasePacket]:
     """
-    Injects a user-defined packet into the engine's global namespace so that it can be deserialized.
+    Looks up a registered packet class by name (case-insensitive). Raises `UnknownPacketError` if 
+    no packet class with that name has been registered.
     """
-    globals()[packet.__name__] = packet
\ No newline at end of file
+    try:
+        return _registered_packets[class_name.lower()]
+    except KeyError:
+        raise UnknownPacketError(f"Packet name not recognized: {class_name}")
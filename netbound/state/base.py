@@ -1,13 +1,15 @@
 from __future__ import annotations
 from netbound.packet import BasePacket
-from typing import Callable, Optional, Coroutine, Any
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from typing import Callable, Optional, Coroutine, Any, TYPE_CHECKING
 from netbound.app.logging_adapter import StateLoggingAdapter
 from netbound.app.game import GameObject, GameObjectsSet
 from dataclasses import dataclass
 import logging
 from abc import ABC
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
 class BaseState(ABC):
     """
     The base state class. All user-defined states must inherit from this class. Definitions you are encouraged to override are:
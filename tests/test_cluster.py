@@ -0,0 +1,173 @@
+import asyncio
+import msgpack
+import socket
+import unittest
+from unittest import mock
+from types import ModuleType
+from sqlalchemy.ext.asyncio import create_async_engine
+from netbound.app import ServerApp
+from netbound.cluster import ClusterFrame
+from netbound.cluster.broker import BaseBroker, LoopbackBroker, LoopbackHub, TcpBroker
+from netbound.constants import EVERYONE
+from netbound.packet import BasePacket
+from netbound.state import BaseState
+
+class ChatPacket(BasePacket):
+    msg: str
+
+received: list[tuple[bytes, bytes, str]] = []
+
+class ChatState(BaseState):
+    async def handle_chat(self, p: ChatPacket) -> None:
+        received.append((self._pid, p.from_pid, p.msg))
+
+    async def handle_disconnect(self, p: BasePacket) -> None:
+        pass
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class ClusterTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        received.clear()
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        self.packets: ModuleType = ModuleType("packets")
+        self.packets.ChatPacket = ChatPacket
+        self.servers: list[ServerApp] = []
+
+    async def asyncTearDown(self) -> None:
+        for server in self.servers:
+            await server._broker.stop()
+        await self.engine.dispose()
+
+    async def add_node(self, broker: BaseBroker) -> tuple[ServerApp, bytes]:
+        server: ServerApp = ServerApp("127.0.0.1", 0, self.engine)
+        server.register_packets(self.packets)
+        server.set_broker(broker)
+        await broker.start()
+        self.servers.append(server)
+        return server, await server.add_npc(ChatState)
+
+    async def tick(self, count: int) -> None:
+        for _ in range(count):
+            for server in self.servers:
+                await server._tick()
+            await asyncio.sleep(0.01)
+
+    async def send(self, server: ServerApp, from_pid: bytes, to_pid: bytes, msg: str) -> None:
+        await server._connected_protocols[from_pid]._state._send_to_other(ChatPacket(from_pid=from_pid, to_pid=to_pid, msg=msg))
+
+    async def check_late_join_and_restart(self, make_broker) -> None:
+        a, pid_a = await self.add_node(make_broker("a"))
+        await self.tick(5)
+
+        b, pid_b = await self.add_node(make_broker("b"))
+        await self.tick(10)
+        self.assertEqual(b._directory.node_of(pid_a), "a")
+        self.assertEqual(a._directory.node_of(pid_b), "b")
+
+        await self.send(b, pid_b, pid_a, "hello a")
+        await self.send(a, pid_a, EVERYONE, "hello everyone")
+        await self.tick(10)
+        self.assertIn((pid_a, pid_b, "hello a"), received)
+        self.assertIn((pid_b, pid_a, "hello everyone"), received)
+
+        # When a node goes away, the others forget about its PIDs
+        await b._broker.stop()
+        self.servers.remove(b)
+        await self.send(a, pid_a, EVERYONE, "anyone there?")
+        await self.tick(10)
+        self.assertIsNone(a._directory.node_of(pid_b))
+
+        # When it comes back, both sides are sent each other's full list of PIDs again
+        b, pid_b = await self.add_node(make_broker("b"))
+        await self.tick(20)
+        self.assertEqual(b._directory.node_of(pid_a), "a")
+        self.assertEqual(a._directory.node_of(pid_b), "b")
+
+    async def test_loopback_late_join_and_restart(self) -> None:
+        hub: LoopbackHub = LoopbackHub()
+        await self.check_late_join_and_restart(lambda node_id: LoopbackBroker(node_id, hub))
+
+    async def test_tcp_late_join_and_restart(self) -> None:
+        peers: dict[str, tuple[str, int]] = {"a": ("127.0.0.1", free_port()), "b": ("127.0.0.1", free_port())}
+        await self.check_late_join_and_restart(lambda node_id: TcpBroker(node_id, *peers[node_id], peers, reconnect_delay=0.01))
+
+    async def test_tcp_one_way_drop(self) -> None:
+        peers: dict[str, tuple[str, int]] = {"a": ("127.0.0.1", free_port()), "b": ("127.0.0.1", free_port())}
+        a, pid_a = await self.add_node(TcpBroker("a", *peers["a"], peers, reconnect_delay=0.01))
+        b, pid_b = await self.add_node(TcpBroker("b", *peers["b"], peers, reconnect_delay=0.01))
+        await self.tick(10)
+        self.assertEqual(a._directory.node_of(pid_b), "b")
+
+        # Only close the connection from a to b, so a's link to b goes down while b's link to a stays up
+        for writer in list(b._broker._peer_writers):
+            writer.close()
+        await self.tick(50)
+        self.assertEqual(a._directory.node_of(pid_b), "b")
+        self.assertEqual(b._directory.node_of(pid_a), "a")
+
+        await self.send(a, pid_a, pid_b, "still there?")
+        await self.tick(10)
+        self.assertIn((pid_b, pid_a, "still there?"), received)
+
+    async def test_bad_packet_entry_keeps_membership(self) -> None:
+        hub: LoopbackHub = LoopbackHub()
+        a, pid_a = await self.add_node(LoopbackBroker("a", hub))
+        pid_c: bytes = b"c" * 16
+        frame: bytes = msgpack.packb({
+            "node": "c",
+            "joined": [pid_c],
+            "left": [],
+            "packets": [
+                [[pid_a], "NewerPacket", {"from_pid": pid_c}],  # e.g. from a node running a newer version
+                [[pid_a], "not an entry"],
+                [[pid_a], "ChatPacket", {"from_pid": pid_c, "to_pid": pid_a, "msg": "hi"}]
+            ],
+            "full": False,
+            "resync": False
+        }, use_bin_type=True)
+
+        decoded: ClusterFrame = ClusterFrame.decode(frame)
+        self.assertEqual(decoded.joined, [pid_c])
+        self.assertEqual(len(decoded.packets), 1)
+
+        a._broker.inbound.put_nowait(frame)
+        await self.tick(2)
+        self.assertEqual(a._directory.node_of(pid_c), "c")
+        self.assertIn((pid_a, pid_c, "hi"), received)
+
+    async def test_packet_for_unlinked_node_is_logged(self) -> None:
+        hub: LoopbackHub = LoopbackHub()
+        a, pid_a = await self.add_node(LoopbackBroker("a", hub))
+        pid_c: bytes = b"c" * 16
+
+        # Node c's link to a is up, but a's link to c is not
+        a._broker.inbound.put_nowait(ClusterFrame("c", joined=[pid_c]).encode())
+        await self.tick(1)
+        await self.send(a, pid_a, pid_c, "hello c")
+        with self.assertLogs("netbound.app.server", "ERROR") as logs:
+            await self.tick(2)
+        self.assertTrue(any("link to node c is down" in line for line in logs.output))
+
+    async def test_unreachable_peer_does_not_block_tick(self) -> None:
+        attempts: list[tuple[str, int]] = []
+
+        async def blackholed_open_connection(host: str, port: int):
+            # Like connecting to a peer whose firewall silently drops packets
+            attempts.append((host, port))
+            await asyncio.Future()
+
+        peers: dict[str, tuple[str, int]] = {"a": ("127.0.0.1", free_port()), "b": ("127.0.0.1", free_port())}
+        with mock.patch("asyncio.open_connection", blackholed_open_connection):
+            a, pid_a = await self.add_node(TcpBroker("a", *peers["a"], peers, connect_timeout=0.02, reconnect_delay=0.01))
+            await self.send(a, pid_a, EVERYONE, "hello")
+            await asyncio.wait_for(self.tick(5), 1)
+
+        self.assertIn((pid_a, pid_a, "hello"), received)
+        self.assertGreater(len(attempts), 1)  # Timed out and tried again
+
+if __name__ == "__main__":
+    unittest.main()
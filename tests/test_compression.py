@@ -0,0 +1,116 @@
+import unittest
+import zlib
+from netbound.packet import BasePacket, MalformedPacketError, compressible
+from netbound.packet.compression import ZlibCompressor, ZstdCompressor, zstandard
+from netbound.packet.serializer import CompressingSerializer, MessagePackSerializer, register_packet
+
+@compressible
+class ChunkPacket(BasePacket):
+    tiles: list[int]
+
+class PositionPacket(BasePacket):
+    tiles: list[int]
+
+register_packet(ChunkPacket)
+register_packet(PositionPacket)
+
+DATA: bytes = b"".join(b'{"tile": %d, "kind": "grass"}' % (i % 7) for i in range(500))
+DICTIONARY: bytes = b'{"tile": 0, "kind": "grass"}{"tile": 1, "kind": "water"}'
+
+class ZlibCompressorTestCase(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        for compressor in [ZlibCompressor(), ZlibCompressor(dictionary=DICTIONARY)]:
+            self.assertEqual(compressor.decompress(compressor.compress(DATA), len(DATA)), DATA)
+            self.assertEqual(compressor.decompress(compressor.compress(b""), 0), b"")
+
+    def test_other_streams(self) -> None:
+        compressor: ZlibCompressor = ZlibCompressor(level=6, dictionary=DICTIONARY)
+        fast: bytes = compressor.compress(DATA)
+        other_level: bytes = ZlibCompressor(level=1, dictionary=DICTIONARY).compress(DATA)
+        self.assertTrue(fast.startswith(compressor._header))
+        self.assertFalse(other_level.startswith(compressor._header))
+
+        # Streams with a different header, or without a dictionary at all, take the slow path
+        self.assertEqual(compressor.decompress(other_level, len(DATA)), DATA)
+        self.assertEqual(compressor.decompress(zlib.compress(DATA, 9), len(DATA)), DATA)
+
+        # Copies of the primed decompressor don't share any state
+        self.assertEqual(compressor.decompress(fast, len(DATA)), DATA)
+        self.assertEqual(compressor.decompress(fast, len(DATA)), DATA)
+
+    def test_rejects_oversized(self) -> None:
+        for compressor in [ZlibCompressor(), ZlibCompressor(dictionary=DICTIONARY)]:
+            with self.assertRaises(MalformedPacketError):
+                compressor.decompress(compressor.compress(DATA), len(DATA) - 1)
+
+    def test_rejects_invalid(self) -> None:
+        for compressor in [ZlibCompressor(), ZlibCompressor(dictionary=DICTIONARY)]:
+            data: bytes = compressor.compress(DATA)
+            for invalid in [data[:len(data) // 2], data[:-1], b"not zlib data", b""]:
+                with self.assertRaises(MalformedPacketError):
+                    compressor.decompress(invalid, len(DATA))
+
+        # The dictionary doesn't match the one the stream was compressed with
+        with self.assertRaises(MalformedPacketError):
+            ZlibCompressor(dictionary=DICTIONARY).decompress(ZlibCompressor(dictionary=b"other").compress(DATA), len(DATA))
+
+    def test_train_dictionary(self) -> None:
+        dictionary: bytes = ZlibCompressor.train_dictionary([DATA[i:i + 300] for i in range(0, len(DATA), 300)], size=256)
+        self.assertLessEqual(len(dictionary), 256)
+        compressor: ZlibCompressor = ZlibCompressor(dictionary=dictionary)
+        self.assertEqual(compressor.decompress(compressor.compress(DATA), len(DATA)), DATA)
+
+@unittest.skipIf(zstandard is None, "zstandard is not installed")
+class ZstdCompressorTestCase(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        for compressor in [ZstdCompressor(), ZstdCompressor(dictionary=DICTIONARY)]:
+            self.assertEqual(compressor.decompress(compressor.compress(DATA), len(DATA)), DATA)
+
+    def test_rejects_oversized(self) -> None:
+        compressor: ZstdCompressor = ZstdCompressor()
+        with self.assertRaises(MalformedPacketError):
+            compressor.decompress(compressor.compress(DATA), len(DATA) - 1)
+
+        # Frames don't have to declare their size up front
+        unsized: bytes = zstandard.ZstdCompressor(write_content_size=False).compress(DATA)
+        self.assertEqual(compressor.decompress(unsized, len(DATA)), DATA)
+        with self.assertRaises(MalformedPacketError):
+            compressor.decompress(unsized, len(DATA) - 1)
+
+    def test_rejects_invalid(self) -> None:
+        compressor: ZstdCompressor = ZstdCompressor()
+        data: bytes = compressor.compress(DATA)
+        for invalid in [data[:len(data) // 2], data[:-1], b"not zstd data", b""]:
+            with self.assertRaises(MalformedPacketError):
+                compressor.decompress(invalid, len(DATA))
+
+class CompressingSerializerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.compressor: ZlibCompressor = ZlibCompressor()
+        self.serializer: CompressingSerializer = CompressingSerializer(self.compressor, threshold=100, max_decompressed_size=1000)
+        self.client: MessagePackSerializer = MessagePackSerializer()
+
+    def test_compresses_large_compressible_packets(self) -> None:
+        large: ChunkPacket = ChunkPacket(from_pid=b"a" * 16, tiles=[1] * 100)
+        data: bytes = self.serializer.serialize(large)
+        self.assertTrue(data.startswith(CompressingSerializer.COMPRESSED_PREFIX))
+        decompressed: bytes = self.compressor.decompress(data[len(CompressingSerializer.COMPRESSED_PREFIX):], 1000)
+        self.assertEqual(self.client.deserialize_as_client(decompressed), large)
+
+    def test_leaves_other_packets_alone(self) -> None:
+        for packet in [ChunkPacket(from_pid=b"a" * 16, tiles=[1]), PositionPacket(from_pid=b"a" * 16, tiles=[1] * 100)]:
+            self.assertEqual(self.serializer.serialize(packet), MessagePackSerializer().serialize(packet))
+
+    def test_deserializes_compressed_and_plain_packets(self) -> None:
+        packet: ChunkPacket = ChunkPacket(from_pid=b"a" * 16, tiles=[1] * 100)
+        data: bytes = self.client.serialize_as_client(packet)
+        self.assertEqual(self.serializer.deserialize(data), packet)
+        self.assertEqual(self.serializer.deserialize(CompressingSerializer.COMPRESSED_PREFIX + self.compressor.compress(data)), packet)
+
+    def test_rejects_oversized_packets(self) -> None:
+        data: bytes = self.client.serialize_as_client(ChunkPacket(from_pid=b"a" * 16, tiles=[1] * 2000))
+        with self.assertRaises(MalformedPacketError):
+            self.serializer.deserialize(CompressingSerializer.COMPRESSED_PREFIX + self.compressor.compress(data))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+import unittest
+
+def run(code: str) -> subprocess.CompletedProcess:
+    # Each check needs a fresh interpreter, since the other tests have already imported everything
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+class ImportTestCase(unittest.TestCase):
+    def test_app_package_is_lazy(self) -> None:
+        result: subprocess.CompletedProcess = run(
+            "import sys, netbound.app; "
+            "assert 'websockets' not in sys.modules and 'sqlalchemy' not in sys.modules"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_star_import(self) -> None:
+        result: subprocess.CompletedProcess = run("from netbound.app import *; ServerApp; WebSocketOptions")
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+from types import ModuleType
+from sqlalchemy.ext.asyncio import create_async_engine
+from netbound.app import ServerApp
+from netbound.app.transport import InMemoryClient, TransportClosedError
+from netbound.packet import BasePacket, DisconnectPacket
+from netbound.state import BaseState
+
+class ChatPacket(BasePacket):
+    msg: str
+
+disconnects: list[tuple[bytes, DisconnectPacket]] = []
+
+class EchoState(BaseState):
+    async def handle_chat(self, p: ChatPacket) -> None:
+        await self._send_to_client(ChatPacket(from_pid=self._pid, msg=p.msg.upper()))
+
+    async def handle_disconnect(self, p: DisconnectPacket) -> None:
+        disconnects.append((self._pid, p))
+        await self._send_to_client(p)
+
+class InMemoryTransportTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        disconnects.clear()
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        self.server: ServerApp = ServerApp("127.0.0.1", 0, self.engine)
+        packets: ModuleType = ModuleType("packets")
+        packets.ChatPacket = ChatPacket
+        self.server.register_packets(packets)
+
+    async def asyncTearDown(self) -> None:
+        await self.engine.dispose()
+
+    async def tick(self, count: int) -> None:
+        for _ in range(count):
+            await asyncio.sleep(0)  # Let the protocols read from their transports
+            await self.server._tick()
+
+    async def test_send_and_receive(self) -> None:
+        client: InMemoryClient = await self.server.connect_in_memory(EchoState)
+        self.assertIn(client.pid, self.server._connected_protocols)
+
+        await client.send_packet(ChatPacket(from_pid=client.pid, msg="hello"))
+        await self.tick(2)
+        reply: BasePacket = await asyncio.wait_for(client.recv_packet(), 1)
+        self.assertIsInstance(reply, ChatPacket)
+        self.assertEqual(reply.msg, "HELLO")
+        self.assertEqual(reply.from_pid, client.pid)
+
+    async def test_close(self) -> None:
+        client: InMemoryClient = await self.server.connect_in_memory(EchoState)
+        other: InMemoryClient = await self.server.connect_in_memory(EchoState)
+
+        await client.close()
+        await self.tick(3)
+        self.assertNotIn(client.pid, self.server._connected_protocols)
+        self.assertEqual([(pid, p.from_pid) for pid, p in disconnects], [(other.pid, client.pid)])
+
+        # The disconnect is forwarded to the other client by its state
+        forwarded: BasePacket = await asyncio.wait_for(other.recv_packet(), 1)
+        self.assertIsInstance(forwarded, DisconnectPacket)
+        self.assertEqual(forwarded.from_pid, client.pid)
+
+        with self.assertRaises(TransportClosedError):
+            await client.recv()
+
+    async def test_connect_without_initial_state(self) -> None:
+        with self.assertRaises(ValueError):
+            await self.server.connect_in_memory()
+
+    async def test_add_npc(self) -> None:
+        pid: bytes = await self.server.add_npc(EchoState)
+        self.assertIsNotNone(self.server._connected_protocols[pid]._state)
+
+        client: InMemoryClient = InMemoryClient()
+        client_pid: bytes = await self.server.add_npc(EchoState, client)
+        self.assertEqual(client.pid, client_pid)
+        self.assertNotEqual(client_pid, pid)
+        self.assertIsNotNone(self.server._connected_protocols[client_pid]._state)
+
+        # The NPCs ping each other. The reply of the NPC without a client is dropped, and the other one is delivered
+        for from_pid, to_pid in [(pid, client_pid), (client_pid, pid)]:
+            await self.server._connected_protocols[from_pid]._state._send_to_other(ChatPacket(from_pid=from_pid, to_pid=to_pid, msg="ping"))
+        await self.tick(3)
+        self.assertIn(pid, self.server._connected_protocols)
+        reply: BasePacket = await asyncio.wait_for(client.recv_packet(), 1)
+        self.assertEqual(reply.msg, "PING")
+
+if __name__ == "__main__":
+    unittest.main()